@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+Helpers shared by fetch_saninsen2025_asahi.py and fetch_saninsen2025_senkyo.py:
+HTTP fetching with rate limiting and retries, kana/romaji conversion, party
+name normalization and the CSV output format.
+"""
+
+import re
+import time
+import random
+import operator
+import functools
+import threading
+from collections import deque
+from types import MappingProxyType
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+from pykakasi import kakasi
+
+OUTPUT_CSV = "saninsen2025_candidates.csv"
+# Rows are streamed here and moved to OUTPUT_CSV once the run has finished
+PARTIAL_CSV = OUTPUT_CSV + ".part"
+# Output columns (csv2giin.py compatible format)
+CSV_KEYS = (
+    "id",
+    "todoufuken",
+    "senkyoku",
+    "seitou",
+    "title",
+    "yomi",
+    "detail",
+    "age",
+    "tubohantei",
+    "tubonaiyou",
+    "tuboURL",
+    "uraganehantei",
+    "uraganenaiyou",
+    "uraganeURL",
+)
+# Turns a candidate dict into a tuple ordered like CSV_KEYS
+csv_row = operator.itemgetter(*CSV_KEYS)
+
+# Maximum number of requests sent per second
+RATE_LIMIT = 4
+# Upper bound on the delay between retries (seconds)
+MAX_BACKOFF = 30
+# Upper bound on a server-requested Retry-After delay (seconds)
+MAX_RETRY_AFTER = 60
+
+_NON_SLUG = re.compile(r"[^a-z0-9]+")
+
+# Send times of the most recent requests, used by acquire()
+_request_times: deque[float] = deque(maxlen=RATE_LIMIT)
+_request_lock = threading.Lock()
+# No request is sent before this time.monotonic() value (set after a 429)
+_not_before = 0.0
+_hold_off_lock = threading.Lock()
+
+_kakasi = kakasi()
+
+# Shared session so that connections to the same host are reused
+SESSION = requests.Session()
+# requests' default Accept-Encoding already offers "br" when the brotli package
+# is installed, so only encodings urllib3 can decode are requested
+SESSION.headers.update({"User-Agent": "Mozilla/5.0 (CandidateFetcher/1.0)"})
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=10))
+
+# Party name variations mapped to their short form. The one-letter keys are
+# the party codes used on asahi.com ("自現①" -> "自").
+_PARTY_ALIASES = MappingProxyType({
+    "自": "自民",
+    "自民党": "自民",
+    "立": "立憲",
+    "立憲民主党": "立憲",
+    "維": "維新",
+    "日本維新の会": "維新",
+    "共": "共産",
+    "共産党": "共産",
+    "日本共産党": "共産",
+    "れ": "れいわ",
+    "れいわ新選組": "れいわ",
+    "保": "日保",
+    "日本保守党": "日保",
+    "諸": "諸派",
+    "無所属連合": "諸派",
+    "その他": "諸派",
+    "無": "無所属",
+    "無所属": "無所属",
+    "公": "公明",
+    "公明党": "公明",
+    "社": "社民",
+    "社民党": "社民",
+    "国民民主党": "国民",
+    "参政党": "参政",
+    "みんなでつくる党": "みんつく",
+    "NHK党": "N国",
+    "再生の道": "再道",
+    "チームみらい": "みらい",
+    "日本改革党": "日改",
+})
+
+
+@functools.lru_cache(maxsize=4096)
+def to_hiragana(text: str) -> str:
+    """Return hiragana reading for given Japanese text."""
+    return "".join(d["hira"] for d in _kakasi.convert(text))
+
+
+@functools.lru_cache(maxsize=4096)
+def slugify_jp(text: str) -> str:
+    """Romanize Japanese text and return a slug suitable for IDs."""
+    romaji = "".join(d["hepburn"] for d in _kakasi.convert(text))
+    romaji = romaji.lower()
+    slug = _NON_SLUG.sub("-", romaji)
+    return slug.strip("-")
+
+
+def unify_party(name: str) -> str:
+    """Normalize party name variations."""
+    return _PARTY_ALIASES.get(name, name)
+
+
+def write_ready(writer, pending: deque, block: bool = False) -> int:
+    """Write rows of finished parse futures from the front of ``pending``.
+
+    ``pending`` holds (label, future) pairs in page order. Unless ``block`` is
+    set, stop at the first future that is not done yet so the output keeps the
+    page order. Return the number of rows written.
+    """
+    written = 0
+    while pending and (block or pending[0][1].done()):
+        label, future = pending.popleft()
+        rows = future.result()
+        if not rows:
+            print(f"  ! No candidates found for {label}")
+        writer.writerows(map(csv_row, rows))
+        written += len(rows)
+    return written
+
+
+def hold_off(delay: float) -> None:
+    """Make acquire() hold back all requests for ``delay`` seconds from now."""
+    global _not_before
+    with _hold_off_lock:
+        _not_before = max(_not_before, time.monotonic() + delay)
+
+
+def acquire() -> None:
+    """Block only as long as needed to stay within RATE_LIMIT requests per second.
+
+    Also waits out any hold-off recorded by hold_off() after a 429 response.
+    """
+    with _request_lock:
+        with _hold_off_lock:
+            wait = _not_before - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        if len(_request_times) == RATE_LIMIT:
+            wait = 1.0 - (time.monotonic() - _request_times[0])
+            if wait > 0:
+                time.sleep(wait)
+        _request_times.append(time.monotonic())
+
+
+def backoff_delay(attempt: int, base: float) -> float:
+    """Return retry delay in seconds using capped exponential backoff with jitter."""
+    return min(MAX_BACKOFF, base * (2 ** attempt) * (1 + random.random() * 0.5))
+
+
+def retry_after_delay(value: str | None, attempt: int, base: float) -> float:
+    """Return seconds to wait for a Retry-After value (delta-seconds or HTTP-date).
+
+    Falls back to the exponential backoff delay if the header is missing or invalid.
+    """
+    if value:
+        value = value.strip()
+        if value.isdigit():
+            return min(MAX_RETRY_AFTER, int(value))
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            when = None
+        if when is not None:
+            if when.tzinfo is None:
+                when = when.replace(tzinfo=timezone.utc)
+            wait = (when - datetime.now(timezone.utc)).total_seconds()
+            return min(MAX_RETRY_AFTER, max(0.0, wait))
+    return backoff_delay(attempt, base)
+
+
+def fetch(url: str, retry: int = 3, sleep: int = 2) -> bytes:
+    """Get URL and return the raw (UTF-8) HTML bytes. Return empty bytes on failure.
+
+    The body is left undecoded so the HTML parsers decode it only once.
+    """
+    for attempt in range(retry):
+        try:
+            acquire()
+            r = SESSION.get(url, timeout=10)
+            if r.status_code == 429:
+                # Rate limited: wait as long as the server asks before retrying
+                # Every thread waits in acquire() until the hold-off has passed
+                delay = retry_after_delay(r.headers.get("Retry-After"), attempt, sleep)
+                hold_off(delay)
+                if attempt == retry - 1:
+                    print(f"  ! {url} returned 429")
+                    break
+                print(f"  ! {url} returned 429, retrying in {delay:.1f}s")
+                continue
+            if r.status_code == 404:
+                # The page does not exist; skip it
+                print(f"  ! {url} returned 404")
+                return b""
+            r.raise_for_status()
+            return r.content
+        except Exception as e:
+            print(f"Retrying {url} because {e}")
+            if attempt < retry - 1:
+                time.sleep(backoff_delay(attempt, sleep))
+    print(f"Failed to fetch {url}. Skipping.")
+    return b""
@@ -4,18 +4,30 @@
 saninsen2025_candidates.csv を生成するスクリプト。
 
 必要ライブラリ:
-    pip install requests beautifulsoup4
+    pip install -r requirements.txt
 
 使用例 (PowerShell):
     python fetch_saninsen2025_asahi.py
 """
 
+import os
 import re
 import csv
-import time
-import requests
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from bs4 import BeautifulSoup
-from pykakasi import kakasi
+from selectolax.lexbor import LexborHTMLParser
+
+from _scrape_utils import (
+    CSV_KEYS,
+    OUTPUT_CSV,
+    PARTIAL_CSV,
+    fetch,
+    slugify_jp,
+    to_hiragana,
+    unify_party,
+    write_ready,
+)
 
 # ベース URL（B01〜B47 が各選挙区、C01 が比例区）
 BASE = "https://www.asahi.com/senkyo/saninsen/koho/"
@@ -25,55 +37,16 @@ FALLBACK_CODES = [f"B{n:02d}" for n in range(1, 48)]
 FALLBACK_CODES.remove("B32")  # 鳥取単独ページは存在しない
 FALLBACK_CODES.append("C01")
 
+# 同時に取得するページ数の上限（サーバー負荷を抑えるため小さめにする）
+MAX_WORKERS = 4
+# HTML 解析に使うプロセス数（取得待ちの間に並行して解析する）
+PARSE_WORKERS = 2
 
-_kakasi = kakasi()
-
-
-def to_hiragana(text: str) -> str:
-    """Return hiragana reading for given Japanese text."""
-    return "".join(d["hira"] for d in _kakasi.convert(text))
-
-
-def slugify_jp(text: str) -> str:
-    """Romanize Japanese text and return a slug suitable for IDs."""
-    romaji = "".join(d["hepburn"] for d in _kakasi.convert(text))
-    romaji = romaji.lower()
-    slug = re.sub(r"[^a-z0-9]+", "-", romaji)
-    return slug.strip("-")
-
-
-def unify_party(name: str) -> str:
-    """Normalize party name variations."""
-    aliases = {
-        "自": "自民",
-        "自民党": "自民",
-        "立": "立憲",
-        "立憲民主党": "立憲",
-        "維": "維新",
-        "日本維新の会": "維新",
-        "共": "共産",
-        "共産党": "共産",
-        "れ": "れいわ",
-        "れいわ新選組": "れいわ",
-        "保": "日保",
-        "日本保守党": "日保",
-        "諸": "諸派",
-        "無所属連合": "諸派",
-        "その他": "諸派",
-        "無": "無所属",
-        "公": "公明",
-        "公明党": "公明",
-        "社": "社民",
-        "社民党": "社民",
-        "国民民主党": "国民",
-        "参政党": "参政",
-        "みんなでつくる党": "みんつく",
-        "NHK党": "N国",
-        "再生の道": "再道",
-        "チームみらい": "みらい",
-        "日本改革党": "日改",
-    }
-    return aliases.get(name, name)
+# 繰り返し使う正規表現はモジュール読み込み時に一度だけコンパイルする
+_WS = re.compile(r"\s+")
+_PARTY = re.compile(r"([^\d現新前元]+)")
+_H1 = re.compile(r"参院選\s*(.+?)候補者一覧")
+_CODE = re.compile(r"/koho/([A-Z]\d{2})\.html")
 
 
 def get_district_codes() -> list[str]:
@@ -83,10 +56,10 @@ def get_district_codes() -> list[str]:
     if not html:
         return FALLBACK_CODES
 
-    soup = BeautifulSoup(html, "html.parser")
+    soup = BeautifulSoup(html, "lxml", from_encoding="utf-8")
     codes: set[str] = set()
     for a in soup.find_all("a", href=True):
-        m = re.search(r"/koho/([A-Z]\d{2})\.html", a["href"])
+        m = _CODE.search(a["href"])
         if m:
             codes.add(m.group(1))
 
@@ -95,68 +68,49 @@ def get_district_codes() -> list[str]:
 
     return sorted(codes)
 
-def fetch(url: str, retry: int = 3, sleep: int = 2) -> str:
-    """指定 URL を取得して HTML 文字列を返す。失敗時は空文字を返す。"""
-
-    for _ in range(retry):
-        try:
-            r = requests.get(
-                url,
-                timeout=10,
-                headers={"User-Agent": "Mozilla/5.0 (CandidateFetcher/1.0)"},
-            )
-            if r.status_code == 404:
-                # ページが存在しない場合はスキップ
-                print(f"  ! {url} returned 404")
-                return ""
-            r.raise_for_status()
-            # 朝日新聞のページは UTF-8 で提供されているが、
-            # requests が誤判定する場合があるため明示的に指定する
-            r.encoding = "utf-8"
-            return r.text
-        except Exception as e:
-            print(f"Retrying {url} because {e}")
-            time.sleep(sleep)
-
-    print(f"Failed to fetch {url}. Skipping.")
-    return ""
-
-def parse_candidates(html: str, default_district: str) -> list[dict]:
+def parse_candidates(html: bytes, default_district: str) -> list[dict]:
     """Return candidate info list for one page in csv2giin.py compatible format."""
-    soup = BeautifulSoup(html, "html.parser")
+    tree = LexborHTMLParser(html)
 
     # ページタイトルから選挙区名を補足（例: "参院選東京 候補者一覧"）
-    h1 = soup.select_one(".PageTitle .Title h1") or soup.find("h1")
+    h1 = tree.css_first(".PageTitle .Title h1") or tree.css_first("h1")
     district = default_district
     if h1:
-        m = re.search(r"参院選\s*(.+?)候補者一覧", h1.get_text(strip=True))
+        m = _H1.search(h1.text(strip=True))
         if m:
             district = m.group(1).split("選挙区")[0].strip()
 
     # 新サイト構造： <div class="snkKohoInfoBox" data-type="yoteisha"> 内の li
-    containers = soup.find_all("div", class_="snkKohoInfoBox", attrs={"data-type": "yoteisha"})
-    tags: list[tuple[BeautifulSoup, str]] = []
+    containers = tree.css('div.snkKohoInfoBox[data-type="yoteisha"]')
+    entries: list[tuple[str, str]] = []
     if containers:
         for c in containers:
-            h3 = c.select_one(".snkTitle h3")
-            container_party = h3.get_text(strip=True) if h3 else ""
-            for li in c.find_all("li"):
-                tags.append((li, container_party))
+            h3 = c.css_first(".snkTitle h3")
+            container_party = h3.text(strip=True) if h3 else ""
+            for li in c.css("li"):
+                # selectolax も空白のみのテキストノードに区切りを入れるため、
+                # get_text(" ", strip=True) と同じ形に空白を詰める
+                text = " ".join(li.text(separator=" ", strip=True).split())
+                entries.append((text, container_party))
     else:
-        # 旧構造にフォールバック
-        section = soup.find("h2", string=lambda x: x and "立候補予定者一覧" in x)
+        # 旧構造にフォールバック（まれなので BeautifulSoup で処理する）
+        soup = BeautifulSoup(html, "lxml", from_encoding="utf-8")
+        section = next(
+            (h2 for h2 in soup.find_all("h2") if "立候補予定者一覧" in h2.get_text()),
+            None,
+        )
         if not section:
             return []
         for tag in section.find_all_next(["li", "p"], limit=200):
             text = tag.get_text(" ", strip=True)
             if (not text) or text.startswith("＊") or "顔ぶれの見方" in text:
                 break
-            tags.append((tag, ""))
+            entries.append((text, ""))
 
     candidates: list[dict] = []
-    for tag, container_party in tags:
-        text = tag.get_text(" ", strip=True).lstrip("●*◇・")
-        parts = re.split(r"\s+", text)
+    for text, container_party in entries:
+        text = text.lstrip("●*◇・")
+        parts = _WS.split(text)
 
         # 年齢の位置を特定（数字のみのトークン）
         age_idx = next((i for i, p in enumerate(parts) if p.isdigit()), -1)
@@ -173,7 +127,7 @@ def parse_candidates(html: str, default_district: str) -> list[dict]:
             party = container_party
         else:
             # "自現①"->"自" etc. Extract first party code.
-            m = re.match(r"([^\d現新前元]+)", party_status)
+            m = _PARTY.match(party_status)
             party = m.group(1) if m else party_status
         party = unify_party(party)
 
@@ -203,46 +157,33 @@ def parse_candidates(html: str, default_district: str) -> list[dict]:
     return candidates
 
 def main() -> None:
-    all_rows: list[dict] = []
+    total = 0
 
     district_codes = get_district_codes()
-    for code in district_codes:
-        url = f"{BASE}{code}.html"
-        print(f"Scraping {url}")
-        html = fetch(url)
-        rows = parse_candidates(html, code)
-        if not rows:
-            print(f"  ! No candidates found for {code}")
-        all_rows.extend(rows)
-        time.sleep(0.5)  # サーバー負荷軽減
-
-    if not all_rows:
+    urls = [f"{BASE}{code}.html" for code in district_codes]
+    # CSV 出力 (csv2giin.py 互換フォーマット)。解析できたページから順に一時ファイルへ
+    # 書き出し、最後に置き換える（途中で失敗しても既存の CSV は残る）
+    with open(PARTIAL_CSV, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_KEYS)
+        # 各ページは独立しているため、同時接続数を絞って並行に取得し、
+        # 取得できたページから順に別プロセスで解析する
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool, \
+                ProcessPoolExecutor(max_workers=PARSE_WORKERS) as parser:
+            pending: deque = deque()
+            for code, url, html in zip(district_codes, urls, pool.map(fetch, urls)):
+                print(f"Scraping {url}")
+                pending.append((code, parser.submit(parse_candidates, html, code)))
+                total += write_ready(writer, pending)
+            total += write_ready(writer, pending, block=True)
+
+    if not total:
+        os.remove(PARTIAL_CSV)
         print("No data scraped. Aborting.")
         return
 
-    # CSV 出力 (csv2giin.py 互換フォーマット)
-    keys = [
-        "id",
-        "todoufuken",
-        "senkyoku",
-        "seitou",
-        "title",
-        "yomi",
-        "detail",
-        "age",
-        "tubohantei",
-        "tubonaiyou",
-        "tuboURL",
-        "uraganehantei",
-        "uraganenaiyou",
-        "uraganeURL",
-    ]
-    with open("saninsen2025_candidates.csv", "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=keys)
-        writer.writeheader()
-        writer.writerows(all_rows)
-
-    print(f"Saved saninsen2025_candidates.csv with {len(all_rows)} records.")
+    os.replace(PARTIAL_CSV, OUTPUT_CSV)
+    print(f"Saved {OUTPUT_CSV} with {total} records.")
 
 if __name__ == "__main__":
     main()
@@ -10,114 +10,120 @@ saninsen2025_candidates.csv を生成するスクリプト。
     python fetch_saninsen2025_senkyo.py
 """
 
+import os
 import re
 import csv
-import time
-import requests
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from bs4 import BeautifulSoup
-from pykakasi import kakasi
+from selectolax.lexbor import LexborHTMLParser
+
+from _scrape_utils import (
+    CSV_KEYS,
+    OUTPUT_CSV,
+    PARTIAL_CSV,
+    fetch,
+    slugify_jp,
+    to_hiragana,
+    unify_party,
+    write_ready,
+)
 
 BASE = "https://go2senkyo.com/sangiin/20376"
 
-_kakasi = kakasi()
-
-
-def to_hiragana(text: str) -> str:
-    """Return hiragana reading for given Japanese text."""
-    return "".join(d["hira"] for d in _kakasi.convert(text))
-
-
-def slugify_jp(text: str) -> str:
-    """Romanize Japanese text and return a slug suitable for IDs."""
-    romaji = "".join(d["hepburn"] for d in _kakasi.convert(text))
-    romaji = romaji.lower()
-    slug = re.sub(r"[^a-z0-9]+", "-", romaji)
-    return slug.strip("-")
-
-
-def unify_party(name: str) -> str:
-    """Normalize party name variations."""
-    aliases = {
-        "自民党": "自民",
-        "立憲民主党": "立憲",
-        "日本維新の会": "維新",
-        "日本共産党": "共産",
-        "れいわ新選組": "れいわ",
-        "日本保守党": "日保",
-        "無所属連合": "諸派",
-        "その他": "諸派",
-        "無所属": "無所属",
-        "公明党": "公明",
-        "社民党": "社民",
-        "国民民主党": "国民",
-        "参政党": "参政",
-        "みんなでつくる党": "みんつく",
-        "NHK党": "N国",
-        "再生の道": "再道",
-        "チームみらい": "みらい",
-        "日本改革党": "日改",
-    }
-    return aliases.get(name, name)
-
-
-def fetch(url: str, retry: int = 3, sleep: int = 2) -> str:
-    """Get URL and return HTML text. Return empty string on failure."""
-    for _ in range(retry):
-        try:
-            r = requests.get(
-                url,
-                timeout=10,
-                headers={"User-Agent": "Mozilla/5.0 (CandidateFetcher/1.0)"},
-            )
-            if r.status_code == 404:
-                print(f"  ! {url} returned 404")
-                return ""
-            r.raise_for_status()
-            r.encoding = "utf-8"
-            return r.text
-        except Exception as e:
-            print(f"Retrying {url} because {e}")
-            time.sleep(sleep)
-    print(f"Failed to fetch {url}. Skipping.")
-    return ""
+# Upper bound on pages fetched concurrently (kept small to be polite)
+MAX_WORKERS = 4
+# Processes used to parse pages while further pages are being downloaded
+PARSE_WORKERS = 2
+
+# Container of a single candidate on prefecture / party pages
+_SECTION = "section.m_senkyo_result_data"
+
+# Regular expressions used per candidate, compiled once at import time
+_DIGITS = re.compile(r"(\d+)")
 
 
 def get_list_paths() -> tuple[list[str], list[str]]:
     """Return lists of prefecture and hirei paths from the top page."""
     html = fetch(BASE)
-    soup = BeautifulSoup(html, "html.parser")
+    soup = BeautifulSoup(html, "lxml", from_encoding="utf-8")
     pref_paths = sorted({a["href"] for a in soup.find_all("a", href=True) if "/prefecture/" in a["href"]})
     hirei_paths = sorted({a["href"] for a in soup.find_all("a", href=True) if "/hirei_party/" in a["href"]})
     return pref_paths, hirei_paths
 
 
-def extract_pref_name(html: str) -> str:
+def extract_pref_name(html: bytes) -> str:
     """Return prefecture name from prefecture page HTML."""
-    soup = BeautifulSoup(html, "html.parser")
-    meta = soup.find("meta", attrs={"name": "description"})
-    text = meta["content"] if meta else soup.title.string if soup.title else ""
+    tree = LexborHTMLParser(html)
+    meta = tree.css_first('meta[name="description"]')
+    title = tree.css_first("title")
+    if meta:
+        text = meta.attributes.get("content") or ""
+    else:
+        text = title.text() if title else ""
     if "選挙区" in text:
         return text.split("選挙区")[0].strip()
     return text.strip()
 
 
-def parse_candidates(html: str, senkyoku: str, is_proportional: bool) -> list[dict]:
-    soup = BeautifulSoup(html, "html.parser")
+def _own_text(node) -> str:
+    """Return the first text node directly under ``node``, stripped."""
+    child = node.child
+    while child is not None:
+        if child.tag == "-text":
+            return child.text(strip=True)
+        child = child.next
+    return ""
+
+
+def _section_of(node) -> int | None:
+    """Return mem_id of the nearest candidate section enclosing ``node``."""
+    parent = node.parent
+    while parent is not None:
+        if parent.tag == "section" and "m_senkyo_result_data" in (
+            parent.attributes.get("class") or ""
+        ).split():
+            return parent.mem_id
+        parent = parent.parent
+    return None
+
+
+def _candidate_nodes(tree: LexborHTMLParser) -> list[list]:
+    """Return [name link, party tag, age span] for each candidate section.
+
+    Each field is collected with one document-wide query and assigned to the
+    section that encloses it, keeping the first match per section just like a
+    per-section ``css_first``. Missing fields stay ``None``.
+    """
+    sections = tree.css(_SECTION)
+    slots = {sec.mem_id: [None, None, None] for sec in sections}
+    fields = (
+        f"{_SECTION} h2.m_senkyo_result_data_ttl a",
+        f"{_SECTION} p.m_senkyo_result_data_circle",
+        f"{_SECTION} p.m_senkyo_result_data_para span",
+    )
+    for i, selector in enumerate(fields):
+        for node in tree.css(selector):
+            slot = slots.get(_section_of(node))
+            if slot is not None and slot[i] is None:
+                slot[i] = node
+    return [slots[sec.mem_id] for sec in sections]
+
+
+def parse_candidates(html: bytes, senkyoku: str, is_proportional: bool) -> list[dict]:
+    tree = LexborHTMLParser(html)
     rows: list[dict] = []
-    for sec in soup.select("section.m_senkyo_result_data"):
-        a = sec.select_one("h2.m_senkyo_result_data_ttl a")
+    for a, party_tag, age_span in _candidate_nodes(tree):
         if not a:
             continue
-        kanji = a.find(string=True, recursive=False).strip()
-        kana_tag = a.select_one("span.m_senkyo_result_data_kana")
-        kana = kana_tag.get_text(strip=True) if kana_tag else ""
+        kanji = _own_text(a)
+        kana_tag = a.css_first("span.m_senkyo_result_data_kana")
+        kana = kana_tag.text(strip=True) if kana_tag else ""
         yomi = to_hiragana(kana.replace(" ", "")) if kana else to_hiragana(kanji.split()[0])
-        party_tag = sec.select_one("p.m_senkyo_result_data_circle")
-        party = unify_party(party_tag.get_text(strip=True)) if party_tag else ""
-        age_span = sec.select_one("p.m_senkyo_result_data_para span")
+        party = unify_party(party_tag.text(strip=True)) if party_tag else ""
         age = ""
         if age_span:
-            m = re.search(r"(\d+)", age_span.get_text())
+            m = _DIGITS.search(age_span.text())
             if m:
                 age = m.group(1)
         senk = "比例" if is_proportional else senkyoku
@@ -142,53 +148,48 @@ def parse_candidates(html: str, senkyoku: str, is_proportional: bool) -> list[di
     return rows
 
 
+def parse_pref_page(html: bytes, path: str) -> list[dict]:
+    """Return candidate rows for one prefecture page."""
+    senkyoku = extract_pref_name(html) or path.rstrip("/").split("/")[-1]
+    return parse_candidates(html, senkyoku, False)
+
+
+def _absolute_url(path: str) -> str:
+    """Return absolute go2senkyo.com URL for a path found on the top page."""
+    return path if path.startswith("http") else f"https://go2senkyo.com{path}"
+
+
 def main() -> None:
     pref_paths, hirei_paths = get_list_paths()
-    all_rows: list[dict] = []
-    for path in pref_paths:
-        url = path if path.startswith("http") else f"https://go2senkyo.com{path}"
-        print(f"Scraping {url}")
-        html = fetch(url)
-        senkyoku = extract_pref_name(html) or path.rstrip("/").split("/")[-1]
-        rows = parse_candidates(html, senkyoku, False)
-        if not rows:
-            print(f"  ! No candidates found for {path}")
-        all_rows.extend(rows)
-        time.sleep(0.5)
-    for path in hirei_paths:
-        url = path if path.startswith("http") else f"https://go2senkyo.com{path}"
-        party_name = path.rstrip("/").split("/")[-2]  # not used but for slug
-        print(f"Scraping {url}")
-        html = fetch(url)
-        rows = parse_candidates(html, party_name, True)
-        if not rows:
-            print(f"  ! No candidates found for {path}")
-        all_rows.extend(rows)
-        time.sleep(0.5)
-    if not all_rows:
+    pref_urls = [_absolute_url(path) for path in pref_paths]
+    hirei_urls = [_absolute_url(path) for path in hirei_paths]
+    total = 0
+    # Rows are written to a temporary file as soon as each page has been
+    # parsed; it replaces OUTPUT_CSV only after a successful run
+    with open(PARTIAL_CSV, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_KEYS)
+        # Pages are independent, so fetch them concurrently with a bounded pool
+        # and parse each one in a worker process as soon as it has arrived
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool, \
+                ProcessPoolExecutor(max_workers=PARSE_WORKERS) as parser:
+            pending: deque = deque()
+            for path, url, html in zip(pref_paths, pref_urls, pool.map(fetch, pref_urls)):
+                print(f"Scraping {url}")
+                pending.append((path, parser.submit(parse_pref_page, html, path)))
+                total += write_ready(writer, pending)
+            for path, url, html in zip(hirei_paths, hirei_urls, pool.map(fetch, hirei_urls)):
+                party_name = path.rstrip("/").split("/")[-2]  # not used but for slug
+                print(f"Scraping {url}")
+                pending.append((path, parser.submit(parse_candidates, html, party_name, True)))
+                total += write_ready(writer, pending)
+            total += write_ready(writer, pending, block=True)
+    if not total:
+        os.remove(PARTIAL_CSV)
         print("No data scraped. Aborting.")
         return
-    keys = [
-        "id",
-        "todoufuken",
-        "senkyoku",
-        "seitou",
-        "title",
-        "yomi",
-        "detail",
-        "age",
-        "tubohantei",
-        "tubonaiyou",
-        "tuboURL",
-        "uraganehantei",
-        "uraganenaiyou",
-        "uraganeURL",
-    ]
-    with open("saninsen2025_candidates.csv", "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=keys)
-        writer.writeheader()
-        writer.writerows(all_rows)
-    print(f"Saved saninsen2025_candidates.csv with {len(all_rows)} records.")
+    os.replace(PARTIAL_CSV, OUTPUT_CSV)
+    print(f"Saved {OUTPUT_CSV} with {total} records.")
 
 
 if __name__ == "__main__":